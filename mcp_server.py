@@ -1,9 +1,13 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Final, List, Optional
 import os
 import time
 import json
-import requests
-from requests.adapters import HTTPAdapter, Retry
+import functools
+from dataclasses import dataclass
+import asyncio
+import random
+import httpx
+import orjson
 from mcp.server.fastmcp import FastMCP
 import re
 
@@ -16,20 +20,384 @@ JUPITERONE_ACCOUNT_ID = os.getenv("JUPITERONE_ACCOUNT_ID")
 JUPITERONE_REGION = os.getenv("JUPITERONE_REGION", "us")
 JUPITERONE_API_URL = f"https://graphql.{JUPITERONE_REGION}.jupiterone.io"
 
-# Create a session with retry logic
-def create_session():
-    session = requests.Session()
-    retries = Retry(
-        total=5,
-        backoff_factor=1,
-        status_forcelist=[429, 502, 503, 504],
-        allowed_methods=["POST", "GET"]
-    )
-    session.mount("https://", HTTPAdapter(max_retries=retries))
-    return session
-
-def make_jupiterone_query(query: str) -> Dict[str, Any]:
-    """Make a query against JupiterOne using direct HTTP requests."""
+# Auth headers are constant for the lifetime of the process. None-valued
+# entries (unset env vars) are filtered out: requests used to drop them
+# silently, but httpx raises a TypeError, which would mask the API's
+# friendly 401 message for missing credentials
+HEADERS = {
+    key: value
+    for key, value in {
+        "Authorization": f"Bearer {JUPITERONE_API_KEY}" if JUPITERONE_API_KEY else None,
+        "JupiterOne-Account": JUPITERONE_ACCOUNT_ID,
+        "Content-Type": "application/json",
+    }.items()
+    if value is not None
+}
+
+# HTTP statuses worth retrying, matching the old urllib3 Retry config
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Ask the download endpoint to compress its JSON-verbose payloads;
+# only advertise brotli if we can actually decode it
+try:
+    import brotli  # noqa: F401
+    _ACCEPT_ENCODING = "gzip, br"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip"
+
+DOWNLOAD_HEADERS = {"Accept-Encoding": _ACCEPT_ENCODING}
+
+# Poll the deferred download URL with exponential backoff between these bounds
+POLL_INITIAL_DELAY = 0.05
+POLL_MAX_DELAY = 2.0
+
+# LIMIT-clause fallback for queries where the fast string scan can't
+# be used, and aggregate detection for the unbounded-query pre-check
+_LIMIT_RE = re.compile(r'\bLIMIT\s+\d+\b', re.IGNORECASE)
+_COUNT_RE = re.compile(r'\bCOUNT\s*\(', re.IGNORECASE)
+
+# Patterns used when parsing J1QL error messages, compiled once at import time
+_LINE_COL_RE = re.compile(r"at line (\d+) column (\d+)")
+_TOKEN_RE = re.compile(r'Unexpected token "([^"]+)"')
+_QUERY_LINE_RE = re.compile(r"\n> \d+ \| (.+)\n")
+_POINTER_RE = re.compile(r"\n    \| (\^+)")
+
+# GraphQL document for queryV1, following the exact structure from client.py
+_QUERY_V1_GQL = """
+query QueryV1($query: String!, $cursor: String, $deferredResponse: DeferredResponseOption) {
+  queryV1(query: $query, cursor: $cursor, deferredResponse: $deferredResponse) {
+    url
+  }
+}
+"""
+
+# Syntax suggestions keyed by the unexpected token from a parsing error
+_TOKEN_SUGGESTIONS = {
+    "=": "In J1QL, property filtering should use 'WITH' clause instead of 'WHERE' for entity properties",
+    "\"": "J1QL requires single quotes (') for string values, not double quotes (\")",
+    "WHRE": "Did you mean 'WHERE'?",
+    "WEHRE": "Did you mean 'WHERE'?",
+    "WHER": "Did you mean 'WHERE'?",
+    "WIH": "Did you mean 'WITH'?",
+    "WIT": "Did you mean 'WITH'?",
+    "WIHT": "Did you mean 'WITH'?",
+}
+
+class AdaptiveLimiter:
+    """Adaptive concurrency limiter for outbound JupiterOne calls.
+
+    Uses the additive-increase/multiplicative-decrease loop TCP uses:
+    the in-flight ceiling grows by one after a streak of clean
+    responses and halves whenever the API signals overload (429/503),
+    so bursty MCP usage converges on what the rate limiter will bear.
+    """
+
+    def __init__(self, min_concurrency: int = 1, max_concurrency: int = 16, initial_concurrency: int = 4):
+        self._min = min_concurrency
+        self._max = max_concurrency
+        self._limit = initial_concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    async def record_overload(self):
+        """Halve the concurrency ceiling after a 429/503 response."""
+        async with self._condition:
+            self._limit = max(self._min, self._limit // 2)
+            self._successes = 0
+
+    async def record_success(self):
+        """Raise the ceiling by one after a streak of clean responses."""
+        async with self._condition:
+            self._successes += 1
+            if self._successes >= 10 and self._limit < self._max:
+                self._limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+# Shared limiter gating every page fetch against the JupiterOne API
+LIMITER = AdaptiveLimiter()
+
+# Shared async client so keep-alive connections are reused across queries and polls
+_session: Optional[httpx.AsyncClient] = None
+
+async def get_session() -> httpx.AsyncClient:
+    """Return the shared httpx client, creating it on first use."""
+    global _session
+    if _session is None:
+        # HTTP/2 multiplexes the rapid poll GETs over one connection
+        # instead of serializing them across HTTP/1.1 keep-alives. The
+        # http2/limits config must live on the transport: client-level
+        # kwargs are ignored when a custom transport is given. Auth
+        # headers stay per-request: the presigned download URLs must not
+        # receive an Authorization header.
+        _session = httpx.AsyncClient(
+            timeout=60,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=5,
+                limits=httpx.Limits(
+                    max_connections=32,
+                    max_keepalive_connections=32,
+                    keepalive_expiry=75,
+                ),
+            ),
+        )
+    return _session
+
+async def request_with_retries(session: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    """Issue a request, retrying transient HTTP errors with backoff."""
+    for attempt in range(5):
+        response = await session.request(method, url, **kwargs)
+        if response.status_code in (429, 503):
+            await LIMITER.record_overload()
+        elif response.status_code < 500:
+            await LIMITER.record_success()
+        if response.status_code in RETRY_STATUSES and attempt < 4:
+            await asyncio.sleep(2 ** attempt)
+            continue
+        return response
+    return response
+
+async def fetch_download(session: httpx.AsyncClient, url: str) -> tuple:
+    """Stream a download URL body, retrying transient HTTP errors.
+
+    Result pages can be very large, so the body is streamed chunk by
+    chunk into a single growable buffer rather than buffered by httpx.
+    Returns a (status_code, body) pair.
+    """
+    for attempt in range(5):
+        async with session.stream("GET", url, headers=DOWNLOAD_HEADERS) as download_response:
+            if download_response.status_code in (429, 503):
+                await LIMITER.record_overload()
+            elif download_response.status_code < 500:
+                await LIMITER.record_success()
+            if download_response.status_code in RETRY_STATUSES and attempt < 4:
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            body = bytearray()
+            async for chunk in download_response.aiter_bytes():
+                body += chunk
+            return download_response.status_code, body
+
+def _has_limit(query: str) -> bool:
+    """Check for a 'LIMIT <number>' clause with plain string scanning.
+
+    Equivalent to the regex \\bLIMIT\\s+\\d+\\b (case-insensitive) but
+    cheaper for the short queries seen on the hot path.
+    """
+    folded = query.casefold()
+    if len(folded) != len(query):
+        # Casefolding can change string length ('ß' -> 'ss'), which would
+        # misalign the scan's indexes; let the regex handle such queries
+        return bool(_LIMIT_RE.search(query))
+    n = len(query)
+    i = folded.find('limit')
+    while i != -1:
+        end = i + 5
+        before = query[i - 1] if i > 0 else ''
+        if not (before.isalnum() or before == '_'):
+            j = end
+            while j < n and query[j].isspace():
+                j += 1
+            if j > end and j < n and query[j].isdigit():
+                while j < n and query[j].isdigit():
+                    j += 1
+                if j == n or not (query[j].isalnum() or query[j] == '_'):
+                    return True
+        i = folded.find('limit', end)
+    return False
+
+@functools.lru_cache(maxsize=1024)
+def _query_shape(query: str) -> tuple:
+    """Analyze a query's shape, cached since LLMs often repeat queries.
+
+    Returns (has_limit, has_aggregate): whether the query carries a
+    LIMIT clause and whether it uses a COUNT(...) aggregate.
+    """
+    return (_has_limit(query), bool(_COUNT_RE.search(query)))
+
+@dataclass(slots=True)
+class J1Entity:
+    """Flattened entity result.
+
+    Slots objects are a fraction of the size of six-key dicts, which
+    matters when a multi-page budget holds many thousands of entities;
+    they become plain dicts only at the response boundary.
+    """
+    id: Any
+    type: Optional[str]
+    class_: Any
+    name: Optional[str]
+    integrationName: Optional[str]
+    properties: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "class": self.class_,
+            "name": self.name,
+            "integrationName": self.integrationName,
+            "properties": self.properties,
+        }
+
+def _flatten(item: Dict[str, Any]) -> Any:
+    """Flatten a raw query result item for easier consumption by LLMs.
+
+    Entity results get their common properties lifted to the top level;
+    other result types (aggregations, property values, etc.) pass through.
+    """
+    entity = item.get('entity')
+    properties = item.get('properties')
+    if entity is not None and properties is not None:
+        return J1Entity(
+            id=item.get("id"),
+            type=entity.get("_type"),
+            class_=entity.get("_class", []),
+            name=entity.get("displayName"),
+            integrationName=entity.get("_integrationName"),
+            properties=properties
+        )
+    return item
+
+async def fetch_page(session: httpx.AsyncClient, query: str, cursor: Optional[str]) -> tuple:
+    """Fetch a single page of query results.
+
+    Returns a (download_data, error) pair; exactly one of the two is None.
+    """
+    async with LIMITER:
+        payload = {
+            "query": _QUERY_V1_GQL,
+            "variables": {
+                "query": query,
+                "deferredResponse": "FORCE",
+                "cursor": cursor
+            },
+            "flags": {"variableResultSize": True}
+        }
+
+        # Get the download URL
+        url_response = await request_with_retries(
+            session,
+            "POST",
+            JUPITERONE_API_URL,
+            headers=HEADERS,
+            content=orjson.dumps(payload),
+        )
+
+        # Handle HTTP errors
+        if url_response.status_code != 200:
+            if url_response.status_code == 401:
+                return None, "401: Unauthorized. Please supply a valid account id and API token."
+            elif url_response.status_code in [429, 503]:
+                return None, "Rate limit exceeded. Please try again later."
+            elif url_response.status_code == 504:
+                return None, "Gateway Timeout."
+            elif url_response.status_code == 500:
+                return None, "JupiterOne API internal server error."
+            else:
+                return None, f"HTTP Error {url_response.status_code}: {url_response.text}"
+
+        # Handle GraphQL errors
+        response_json = orjson.loads(url_response.content)
+        if "errors" in response_json:
+            errors = response_json["errors"]
+            error_messages = []
+
+            for error in errors:
+                error_message = error.get("message", "Unknown error")
+
+                # Special handling for J1QL parsing errors
+                if "Error parsing query" in error_message:
+                    # Extract useful information from parsing error
+                    error_data = {
+                        "type": "J1QL_PARSING_ERROR",
+                        "message": "Error parsing J1QL query"
+                    }
+
+                    # Extract line and column info if available
+                    line_col_match = _LINE_COL_RE.search(error_message)
+                    if line_col_match:
+                        error_data["line"] = int(line_col_match.group(1))
+                        error_data["column"] = int(line_col_match.group(2))
+
+                    # Extract the unexpected token
+                    token_match = _TOKEN_RE.search(error_message)
+                    if token_match:
+                        error_data["unexpected_token"] = token_match.group(1)
+
+                    # Extract the query line with the error
+                    query_line_match = _QUERY_LINE_RE.search(error_message)
+                    if query_line_match:
+                        error_data["query_line"] = query_line_match.group(1)
+
+                        # Add pointer to the error position
+                        pointer_match = _POINTER_RE.search(error_message)
+                        if pointer_match:
+                            error_data["pointer"] = pointer_match.group(1)
+
+                    # Add common syntax suggestions based on token type
+                    if token_match:
+                        token = token_match.group(1)
+                        suggestion = _TOKEN_SUGGESTIONS.get(token)
+                        # Incorrect order of WITH and AS
+                        if suggestion is None and token == "WITH" and "AS" in query and query.find("AS") < query.find("WITH"):
+                            suggestion = "In J1QL, 'WITH' must come before 'AS'"
+                        if suggestion is not None:
+                            error_data["suggestion"] = suggestion
+
+                    return None, error_data
+
+                error_messages.append(error_message)
+
+            return None, f"GraphQL errors: {', '.join(error_messages)}"
+
+        # Extract download URL and fetch results
+        try:
+            download_url = response_json['data']['queryV1']['url']
+
+            # Poll the download URL until results are ready, backing off
+            # exponentially (with a little jitter) while the query runs
+            delay = POLL_INITIAL_DELAY
+            while True:
+                status_code, body = await fetch_download(session, download_url)
+                if status_code != 200:
+                    return None, f"Failed to fetch query results: {status_code}"
+
+                download_data = orjson.loads(body)
+                status = download_data.get('status')
+
+                if status != 'IN_PROGRESS':
+                    break
+
+                await asyncio.sleep(delay + random.uniform(0, delay * 0.1))
+                delay = min(delay * 1.7, POLL_MAX_DELAY)
+
+            return download_data, None
+
+        except (KeyError, json.JSONDecodeError) as e:
+            return None, f"Failed to process query response: {str(e)}"
+
+async def make_jupiterone_query(query: str, cursor: Optional[str] = None, max_pages: int = 1) -> Dict[str, Any]:
+    """Make a query against JupiterOne using direct HTTP requests.
+
+    Fetches at most max_pages pages starting from cursor and returns the
+    continuation cursor in metadata, so callers see the first page in
+    O(page) time and memory instead of waiting for the full result set.
+    """
     response = {
         "query": query,
         "success": False,
@@ -39,202 +407,76 @@ def make_jupiterone_query(query: str) -> Dict[str, Any]:
             "count": 0
         }
     }
-    
+
     try:
-        session = create_session()
-        headers = {
-            "Authorization": f"Bearer {JUPITERONE_API_KEY}",
-            "JupiterOne-Account": JUPITERONE_ACCOUNT_ID,
-            "Content-Type": "application/json",
-        }
-        
+        session = await get_session()
+
         all_query_results = []
-        current_cursor = None
-        
-        # Check if the query has a LIMIT clause
-        has_limit = bool(re.search(r'\bLIMIT\s+\d+\b', query, re.IGNORECASE))
-        
-        while True:
-            # Prepare query payload following the exact structure from client.py
-            query_gql = """
-            query QueryV1($query: String!, $cursor: String, $deferredResponse: DeferredResponseOption) {
-              queryV1(query: $query, cursor: $cursor, deferredResponse: $deferredResponse) {
-                url
-              }
-            }
-            """
-            
-            variables = {
-                "query": query,
-                "deferredResponse": "FORCE",
-                "cursor": current_cursor
-            }
-            
-            payload = {
-                "query": query_gql,
-                "variables": variables,
-                "flags": {"variableResultSize": True}
+
+        # Check the query's shape before spending a network round trip
+        has_limit, has_aggregate = _query_shape(query)
+
+        # The J1QL guide itself forbids queries with neither a LIMIT nor
+        # an aggregate; reject them here instead of starting an unbounded
+        # scan on the API side
+        if not has_limit and not has_aggregate and cursor is None:
+            response["error"] = {
+                "type": "UNBOUNDED_QUERY",
+                "message": "Query has no LIMIT clause and no aggregate, so it would scan the entire graph",
+                "suggestion": "Add 'LIMIT <number>' (5-100) or use COUNT(...) for discovery; see the j1ql_guide prompt"
             }
-            
-            # Get the download URL
-            url_response = session.post(
-                JUPITERONE_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
-            
-            # Handle HTTP errors
-            if url_response.status_code != 200:
-                if url_response.status_code == 401:
-                    response["error"] = "401: Unauthorized. Please supply a valid account id and API token."
-                elif url_response.status_code in [429, 503]:
-                    response["error"] = "Rate limit exceeded. Please try again later."
-                elif url_response.status_code == 504:
-                    response["error"] = "Gateway Timeout."
-                elif url_response.status_code == 500:
-                    response["error"] = "JupiterOne API internal server error."
-                else:
-                    response["error"] = f"HTTP Error {url_response.status_code}: {url_response.text}"
-                return response
-            
-            # Handle GraphQL errors
-            response_json = url_response.json()
-            if "errors" in response_json:
-                errors = response_json["errors"]
-                error_messages = []
-                
-                for error in errors:
-                    error_message = error.get("message", "Unknown error")
-                    
-                    # Special handling for J1QL parsing errors
-                    if "Error parsing query" in error_message:
-                        # Extract useful information from parsing error
-                        error_data = {
-                            "type": "J1QL_PARSING_ERROR",
-                            "message": "Error parsing J1QL query"
-                        }
-                        
-                        # Extract line and column info if available
-                        line_col_match = re.search(r"at line (\d+) column (\d+)", error_message)
-                        if line_col_match:
-                            error_data["line"] = int(line_col_match.group(1))
-                            error_data["column"] = int(line_col_match.group(2))
-                        
-                        # Extract the unexpected token
-                        token_match = re.search(r"Unexpected token \"([^\"]+)\"", error_message)
-                        if token_match:
-                            error_data["unexpected_token"] = token_match.group(1)
-                        
-                        # Extract the query line with the error
-                        query_line_match = re.search(r"\n> \d+ \| (.+)\n", error_message)
-                        if query_line_match:
-                            error_data["query_line"] = query_line_match.group(1)
-                            
-                            # Add pointer to the error position
-                            pointer_match = re.search(r"\n    \| (\^+)", error_message)
-                            if pointer_match:
-                                error_data["pointer"] = pointer_match.group(1)
-                        
-                        # Add common syntax suggestions based on token type
-                        if token_match:
-                            token = token_match.group(1)
-                            if token == "=":
-                                error_data["suggestion"] = "In J1QL, property filtering should use 'WITH' clause instead of 'WHERE' for entity properties"
-                            elif token == "\"":
-                                error_data["suggestion"] = "J1QL requires single quotes (') for string values, not double quotes (\")"
-                            elif token == "WHRE" or token == "WEHRE" or token == "WHER":
-                                error_data["suggestion"] = "Did you mean 'WHERE'?"
-                            elif token == "WIH" or token == "WIT" or token == "WIHT":
-                                error_data["suggestion"] = "Did you mean 'WITH'?"
-                            # Incorrect order of WITH and AS
-                            elif token == "WITH" and "AS" in query and query.find("AS") < query.find("WITH"):
-                                error_data["suggestion"] = "In J1QL, 'WITH' must come before 'AS'"
-                        
-                        response["error"] = error_data
-                        return response
-                    
-                    error_messages.append(error_message)
-                
-                response["error"] = f"GraphQL errors: {', '.join(error_messages)}"
-                return response
-            
-            # Extract download URL and fetch results
-            try:
-                download_url = response_json['data']['queryV1']['url']
-                
-                # Poll the download URL until results are ready
-                while True:
-                    download_response = session.get(download_url, timeout=60)
-                    if download_response.status_code != 200:
-                        response["error"] = f"Failed to fetch query results: {download_response.status_code}"
-                        return response
-                    
-                    download_data = download_response.json()
-                    status = download_data.get('status')
-                    
-                    if status != 'IN_PROGRESS':
-                        break
-                    
-                    time.sleep(0.2)  # Sleep 200 milliseconds between checks
-                
-                # Add results to the collection
-                if 'data' in download_data:
-                    # Process the results for easier consumption by LLMs
-                    processed_results = []
-                    for item in download_data['data']:
-                        # For entity results with nested structures, flatten important properties
-                        if 'entity' in item and 'properties' in item:
-                            # Create a processed version with common properties at the top level
-                            processed_item = {
-                                "id": item.get("id"),
-                                "type": item["entity"].get("_type"),
-                                "class": item["entity"].get("_class", []),
-                                "name": item["entity"].get("displayName"),
-                                "integrationName": item["entity"].get("_integrationName"),
-                                "properties": item["properties"]
-                            }
-                            processed_results.append(processed_item)
-                        else:
-                            # For other result types (aggregations, property values, etc.)
-                            processed_results.append(item)
-                    
-                    all_query_results.extend(processed_results)
-                    
-                    # Update metadata with information about pagination
-                    if 'cursor' in download_data:
-                        response["metadata"]["has_more"] = True
-                    else:
-                        response["metadata"]["has_more"] = False
-                        
-                else:
-                    # If there's no data but no error, it might be an empty result
-                    if download_data.get('error'):
-                        response["error"] = f"Query error: {download_data.get('error')}"
-                        return response
-                
-                # If query has a LIMIT clause, we only need the first page
-                # since variableResultSize should return up to the limit in one page
-                if has_limit:
-                    break
-                
-                # Otherwise check for more pages
-                if 'cursor' in download_data and download_data['cursor']:
-                    current_cursor = download_data['cursor']
-                else:
-                    break
-                    
-            except (KeyError, json.JSONDecodeError) as e:
-                response["error"] = f"Failed to process query response: {str(e)}"
+            return response
+
+        next_cursor = cursor
+        pages_fetched = 0
+        next_task = asyncio.create_task(fetch_page(session, query, next_cursor))
+        while True:
+            download_data, error = await next_task
+            next_task = None
+
+            if error is not None:
+                response["error"] = error
                 return response
-        
-        # Update response with successful results
+
+            pages_fetched += 1
+            next_cursor = download_data.get('cursor')
+
+            # If the query has a LIMIT clause we only need the first page,
+            # since variableResultSize should return up to the limit in one
+            # page. Otherwise prefetch the next page (up to the max_pages
+            # budget) while we process this one, so poll waits overlap.
+            if next_cursor and not has_limit and pages_fetched < max_pages:
+                next_task = asyncio.create_task(fetch_page(session, query, next_cursor))
+
+            # Add results to the collection, flattening as we go
+            if 'data' in download_data:
+                all_query_results.extend(_flatten(item) for item in download_data['data'])
+            else:
+                # If there's no data but no error, it might be an empty result
+                if download_data.get('error'):
+                    if next_task is not None:
+                        next_task.cancel()
+                    response["error"] = f"Query error: {download_data.get('error')}"
+                    return response
+
+            if next_task is None:
+                break
+
+        # Update response with successful results and the continuation
+        # cursor callers can pass back to fetch the next pages
         response["success"] = True
-        response["results"] = all_query_results
+        response["results"] = [
+            r.to_dict() if isinstance(r, J1Entity) else r for r in all_query_results
+        ]
         response["metadata"]["count"] = len(all_query_results)
+        if next_cursor:
+            response["metadata"]["has_more"] = True
+            response["metadata"]["cursor"] = next_cursor
+        else:
+            response["metadata"]["has_more"] = False
         return response
-        
-    except requests.RequestException as e:
+
+    except httpx.HTTPError as e:
         response["error"] = f"Request failed: {str(e)}"
         return response
     except Exception as e:
@@ -242,22 +484,19 @@ def make_jupiterone_query(query: str) -> Dict[str, Any]:
         return response
 
 @mcp.tool()
-async def run_j1_query(query: str) -> Any:
+async def run_j1_query(query: str, cursor: Optional[str] = None, max_pages: int = 1) -> Any:
     """Run a query against JupiterOne.
 
     Args:
         query: The query to run against JupiterOne.
+        cursor: Continuation cursor from a previous call's metadata, to
+            fetch the next pages of the same query.
+        max_pages: Maximum number of result pages to fetch in one call.
     """
-    result = make_jupiterone_query(query)
-    return result
+    return await make_jupiterone_query(query, cursor=cursor, max_pages=max_pages)
 
-@mcp.prompt()
-def j1ql_guide() -> str:
-    """JupiterOne Query Language (J1QL) Guide for creating valid queries.
-    
-    This prompt provides comprehensive guidelines for constructing J1QL queries.
-    """
-    return """
+# Built once at import time so the prompt handler just returns a reference
+_J1QL_GUIDE: Final[str] = """
 ### JupiterOne Query Language (J1QL) Guide
 
 > **CRITICAL:** Follow this guide strictly. Any deviation may result in query failure. Do not use operators not documented here.
@@ -424,5 +663,13 @@ FIND * AS ent RETURN ent._type, COUNT(ent) AS cnt ORDER BY cnt DESC LIMIT 50
 ```
 """
 
+@mcp.prompt()
+def j1ql_guide() -> str:
+    """JupiterOne Query Language (J1QL) Guide for creating valid queries.
+
+    This prompt provides comprehensive guidelines for constructing J1QL queries.
+    """
+    return _J1QL_GUIDE
+
 if __name__ == "__main__":
     mcp.run(transport='stdio')